@@ -0,0 +1,183 @@
+import os
+import threading
+import time
+from dotenv import load_dotenv
+from openai import APIConnectionError, InternalServerError, RateLimitError
+
+# Read backend/.env before the limits below are evaluated at import time
+load_dotenv()
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+class Pool:
+    """Bounded concurrency pool with a bounded wait queue.
+
+    At most `max_concurrency` requests run at once. Up to `max_queue` more
+    may wait (for at most `queue_timeout` seconds) for a slot; anything past
+    that is rejected straight away so the caller can shed load.
+    """
+
+    def __init__(self, name: str, max_concurrency: int, max_queue: int, queue_timeout: float, retry_after: int):
+        self.name = name
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.active = 0
+        self.waiting = 0
+        self._cond = threading.Condition()
+
+    def acquire(self) -> bool:
+        with self._cond:
+            if self.active < self.max_concurrency and self.waiting == 0:
+                self.active += 1
+                return True
+
+            if self.waiting >= self.max_queue:
+                return False
+
+            self.waiting += 1
+            try:
+                deadline = time.monotonic() + self.queue_timeout
+                while self.active >= self.max_concurrency:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    self._cond.wait(remaining)
+                self.active += 1
+                return True
+            finally:
+                self.waiting -= 1
+
+    def release(self):
+        with self._cond:
+            self.active = max(0, self.active - 1)
+            self._cond.notify()
+
+    def snapshot(self) -> dict:
+        with self._cond:
+            return {
+                "active": self.active,
+                "waiting": self.waiting,
+                "max_concurrency": self.max_concurrency,
+                "max_queue": self.max_queue,
+            }
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is refused because the circuit breaker is open."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Circuit open, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Trip after `failure_threshold` consecutive failures.
+
+    While open every call fails fast with CircuitOpenError. After
+    `reset_timeout` seconds one trial call is let through (half-open); its
+    result decides whether the breaker closes again or stays open.
+
+    Only exceptions in `failure_types` count as failures; anything else
+    (e.g. a bad request from one caller) is re-raised without affecting it.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float, failure_types=(Exception,)):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.failure_types = failure_types
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                return "half-open"
+            return "open"
+
+    def _before_call(self):
+        with self._lock:
+            if self.opened_at is None:
+                return
+            elapsed = time.monotonic() - self.opened_at
+            if elapsed < self.reset_timeout or self._trial_in_flight:
+                raise CircuitOpenError(max(1.0, self.reset_timeout - elapsed))
+            self._trial_in_flight = True
+
+    def _on_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def _on_other_error(self):
+        with self._lock:
+            self._trial_in_flight = False
+
+    def _on_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial_in_flight or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+    def call(self, fn, *args, **kwargs):
+        self._before_call()
+        try:
+            result = fn(*args, **kwargs)
+        except self.failure_types:
+            self._on_failure()
+            raise
+        except Exception:
+            self._on_other_error()
+            raise
+        self._on_success()
+        return result
+
+
+LLM_POOL = Pool(
+    "llm",
+    max_concurrency=_env_int("LLM_MAX_CONCURRENCY", 4),
+    max_queue=_env_int("LLM_MAX_QUEUE", 8),
+    queue_timeout=_env_float("LLM_QUEUE_TIMEOUT", 5.0),
+    retry_after=_env_int("LLM_RETRY_AFTER", 10),
+)
+
+FAST_POOL = Pool(
+    "fast",
+    max_concurrency=_env_int("FAST_MAX_CONCURRENCY", 32),
+    max_queue=_env_int("FAST_MAX_QUEUE", 64),
+    queue_timeout=_env_float("FAST_QUEUE_TIMEOUT", 2.0),
+    retry_after=_env_int("FAST_RETRY_AFTER", 1),
+)
+
+OPENAI_TIMEOUT = _env_float("OPENAI_TIMEOUT", 15.0)
+# SDK retries would multiply the timeout and hide failures from the breaker
+OPENAI_MAX_RETRIES = _env_int("OPENAI_MAX_RETRIES", 0)
+
+OPENAI_BREAKER = CircuitBreaker(
+    failure_threshold=_env_int("OPENAI_BREAKER_THRESHOLD", 5),
+    reset_timeout=_env_float("OPENAI_BREAKER_RESET", 30.0),
+    # Upstream health only (APITimeoutError is an APIConnectionError); 4xx
+    # errors like an oversized note are the caller's problem
+    failure_types=(APIConnectionError, RateLimitError, InternalServerError),
+)
@@ -1,17 +1,20 @@
 import os
+import uuid
 import hdbscan
 import re
 from nltk.tokenize import word_tokenize
-from sentence_transformers import SentenceTransformer
-from flask import Flask, jsonify, request
+from flask import Flask, g, jsonify, request
 from flask_cors import CORS
 from dotenv import load_dotenv
 from supabase import create_client, Client
-from openai import OpenAI
+from openai import OpenAI, APIError
 from openai.types.chat import ChatCompletionSystemMessageParam, ChatCompletionUserMessageParam
 from typing import Dict, Any, cast
 from nltk.corpus import stopwords
 import numpy as np
+from admission import LLM_POOL, FAST_POOL, OPENAI_BREAKER, OPENAI_TIMEOUT, OPENAI_MAX_RETRIES, CircuitOpenError
+from embeddings import get_embedding_model, to_vector_text
+from classifier import category_classifier, CATEGORIES, CONFIDENCE_THRESHOLD
 
 load_dotenv()
 SUPABASE_URL = os.getenv("SUPABASE_URL") or ""
@@ -21,7 +24,7 @@ supabase: Client = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
 
 OPENAI_KEY = os.getenv("OPENAI_API_KEY")
 if OPENAI_KEY:
-    client = OpenAI(api_key=OPENAI_KEY)
+    client = OpenAI(api_key=OPENAI_KEY, timeout=OPENAI_TIMEOUT, max_retries=OPENAI_MAX_RETRIES)
     print(" OpenAI enabled")
 else:
     client = None
@@ -30,6 +33,44 @@ else:
 app = Flask(__name__)
 CORS(app)
 
+# Endpoints that always wait on OpenAI, and endpoints that only do when organizing
+LLM_ENDPOINTS = {"get_advice"}
+ORGANIZE_ENDPOINTS = {"create_note", "update_note"}
+# Never queued or shed so load balancers can always reach them
+UNMETERED_ENDPOINTS = {"health", "home", "static"}
+
+def select_pool():
+    """Pick the admission pool for the current request (None = unmetered)"""
+    if request.method == "OPTIONS" or request.endpoint in UNMETERED_ENDPOINTS:
+        return None
+    if request.endpoint in LLM_ENDPOINTS:
+        return LLM_POOL
+    if request.endpoint in ORGANIZE_ENDPOINTS:
+        body = request.get_json(force=True, silent=True) or {}
+        if body.get("organize", False):
+            return LLM_POOL
+    return FAST_POOL
+
+@app.before_request
+def admit_request():
+    pool = select_pool()
+    if pool is None:
+        return None
+    if not pool.acquire():
+        return jsonify({"error": "Server busy, try again later"}), 429, {"Retry-After": str(pool.retry_after)}
+    g.admission_pool = pool
+    return None
+
+@app.teardown_request
+def release_request(exc):
+    pool = g.pop("admission_pool", None)
+    if pool is not None:
+        pool.release()
+
+def create_chat_completion(**kwargs):
+    """Call OpenAI chat completions behind the circuit breaker (client sets timeout, no retries)"""
+    return OPENAI_BREAKER.call(client.chat.completions.create, **kwargs)
+
 @app.get("/health")
 def health():
     return jsonify({"ok": True}), 200
@@ -68,7 +109,7 @@ def create_note():
     
     try:
         # Create embedding (always do this - it's free/local)
-        model = SentenceTransformer("all-MiniLM-L6-v2")
+        model = get_embedding_model()
         embedding = model.encode(new_note["content"]).tolist()
 
         # Only generate insights if organizing
@@ -78,25 +119,29 @@ def create_note():
             if not new_note["title"] or new_note["title"] == "Untitled":
                 new_note["title"] = generate_title(new_note["content"])
             # Always generate category in organize mode
-            category = generate_category(new_note["content"])
+            category, category_source = generate_category(new_note["content"], embedding)
         else:
             # Regular save: no insights, use defaults
             insights = None
             if not new_note["title"]:
                 new_note["title"] = "Untitled"
             category = user_category if user_category else "Personal"
+            # The app always sends its preselected category, so it's only the
+            # user's label if the picker was actually used
+            category_source = "user" if user_category and body.get("category_picked") else "default"
         
         insert_data = {
             **new_note,
             "insights": insights,
             "category": category,
+            "category_source": category_source,
             "user_id": user_id
         }
         res = supabase.table("notes").insert(insert_data).execute()
 
         if res.data and len(res.data) > 0:
             note_id = res.data[0]["id"]
-            embedding_text = "[" + ",".join(map(str, embedding)) + "]"
+            embedding_text = to_vector_text(embedding)
             supabase.rpc(
                 "update_note_embedding",
                 {
@@ -147,6 +192,11 @@ def create_note():
                 print(f"Activity tracking error: {track_error}")
         
         return jsonify(res.data[0] if res.data else {}), 201
+    except CircuitOpenError as e:
+        return jsonify({"error": "AI temporarily unavailable"}), 503, {"Retry-After": str(int(e.retry_after))}
+    except APIError as e:
+        print(f"OpenAI error while organizing: {e}")
+        return jsonify({"error": "AI request failed, note not saved"}), 502
     except Exception as e:
         import traceback; traceback.print_exc()
         return jsonify({"error": str(e)}), 500
@@ -177,12 +227,20 @@ def update_note(note_id: str):
         return jsonify({"error": "No fields to update"}), 400
     try:
         if "content" in updates:
-            model = SentenceTransformer("all-MiniLM-L6-v2")
+            model = get_embedding_model()
             embedding = model.encode(updates["content"]).tolist()
             
+            # Only generate insights if organize mode
+            # (before the embedding write, so an unavailable AI leaves the note untouched)
+            if should_organize:
+                updates["insights"] = generate_insights(updates["content"])
+                updates["title"] = generate_title(updates["content"])
+                updates["category"], updates["category_source"] = generate_category(updates["content"], embedding)
+            # If regular save with content change, don't regenerate insights
+            
             # Don't include embedding in regular update - it won't work
             # Do it via RPC instead
-            embedding_text = "[" + ",".join(map(str, embedding)) + "]"
+            embedding_text = to_vector_text(embedding)
             supabase.rpc(
                 "update_note_embedding",
                 {
@@ -190,18 +248,23 @@ def update_note(note_id: str):
                     "p_embedding_text": embedding_text
                 }
             ).execute()
-            
-            # Only generate insights if organize mode
-            if should_organize:
-                updates["insights"] = generate_insights(updates["content"])
-                updates["title"] = generate_title(updates["content"])
-                updates["category"] = generate_category(updates["content"])
-            # If regular save with content change, don't regenerate insights
+        
+        if updates.get("category") and "category_source" not in updates:
+            # The edit screen sends back the stored category on every save;
+            # only an actual change is the user's label
+            current = supabase.table("notes").select("category").eq("id", note_id).execute()
+            if current.data and current.data[0].get("category") != updates["category"]:
+                updates["category_source"] = "user"
         
         res = supabase.table("notes").update(updates).eq("id", note_id).execute()
         if not res.data:
             return jsonify({"error": "Note not found"}), 404
         return jsonify(res.data[0]), 200
+    except CircuitOpenError as e:
+        return jsonify({"error": "AI temporarily unavailable"}), 503, {"Retry-After": str(int(e.retry_after))}
+    except APIError as e:
+        print(f"OpenAI error while organizing: {e}")
+        return jsonify({"error": "AI request failed, note not saved"}), 502
     except Exception as e:
         import traceback; traceback.print_exc()
         return jsonify({"error": str(e)}), 500
@@ -316,6 +379,149 @@ def uncomplete_task(note_id: str):
         import traceback; traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
+MAX_BATCH_OPERATIONS = 200
+BATCH_OPERATIONS = {"complete", "uncomplete", "delete", "set_category"}
+
+@app.post("/notes/batch")
+def batch_notes():
+    """Apply complete/uncomplete/delete/category operations to many notes at once.
+
+    Each kind of operation is applied with a single set-based query and
+    tasks_completed is adjusted once by the net change.
+    """
+    data = request.get_json(silent=True) or {}
+    user_id = data.get("user_id")
+    operations = data.get("operations")
+
+    if not user_id:
+        return jsonify({"error": "user_id required"}), 400
+    try:
+        # Validated here so a bad value can't fail the ownership query with a 500
+        user_id = str(uuid.UUID(str(user_id)))
+    except ValueError:
+        return jsonify({"error": "user_id must be a UUID"}), 400
+    if not isinstance(operations, list) or not operations:
+        return jsonify({"error": "operations must be a non-empty list"}), 400
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        return jsonify({"error": f"At most {MAX_BATCH_OPERATIONS} operations per batch"}), 400
+
+    try:
+        from datetime import datetime
+
+        results = []
+        seen_ids = set()
+        for op in operations:
+            op = op if isinstance(op, dict) else {}
+            result = {"id": op.get("id"), "op": op.get("op")}
+            results.append(result)
+            # Note ids are bigints; a bad one must not fail the whole batch's queries
+            try:
+                note_id = int(str(result["id"]).strip())
+            except ValueError:
+                note_id = None
+            raw_category = op.get("category")
+            category = raw_category.strip() if isinstance(raw_category, str) else ""
+            if result["op"] not in BATCH_OPERATIONS:
+                result.update(ok=False, status=400, error="Unknown operation")
+            elif note_id is None:
+                result.update(ok=False, status=400, error="id must be a note id")
+            elif raw_category is not None and not isinstance(raw_category, str):
+                result.update(ok=False, status=400, error="category must be a string")
+            elif note_id in seen_ids:
+                result.update(ok=False, status=400, error="Note appears more than once in batch")
+            elif result["op"] == "set_category" and category not in CATEGORIES:
+                result.update(ok=False, status=400, error=f"category must be one of {', '.join(CATEGORIES)}")
+            else:
+                seen_ids.add(note_id)
+                result["note_id"] = note_id
+                result["category"] = category or None
+
+        pending = [r for r in results if "ok" not in r]
+
+        # One read to check ownership and current completion state
+        notes_by_id = {}
+        if pending:
+            notes_res = supabase.table("notes")\
+                .select("id, is_completed")\
+                .eq("user_id", user_id)\
+                .in_("id", [r["note_id"] for r in pending])\
+                .execute()
+            notes_by_id = {n["id"]: n for n in notes_res.data or []}
+
+        groups = {}
+        for r in pending:
+            note = notes_by_id.get(r["note_id"])
+            if not note:
+                r.update(ok=False, status=404, error="Note not found")
+            elif r["op"] == "complete" and note.get("is_completed"):
+                r.update(ok=False, status=400, error="Task already completed")
+            elif r["op"] == "uncomplete" and not note.get("is_completed"):
+                r.update(ok=False, status=400, error="Task is not completed")
+            else:
+                key = (r["op"], r["category"]) if r["op"] == "set_category" else (r["op"], None)
+                groups.setdefault(key, []).append(r)
+
+        tasks_delta = 0
+        for (op_name, category), group in groups.items():
+            ids = [r["note_id"] for r in group]
+            query = supabase.table("notes")
+            if op_name == "complete":
+                # Guard on is_completed so a concurrent request can't double count
+                # (NULL counts as not completed, same as the precheck above)
+                query = query.update({
+                    "is_completed": True,
+                    "is_task": True,
+                    "completed_at": datetime.now().isoformat()
+                }).or_("is_completed.is.null,is_completed.eq.false")
+            elif op_name == "uncomplete":
+                query = query.update({
+                    "is_completed": False,
+                    "completed_at": None
+                }).eq("is_completed", True)
+            elif op_name == "set_category":
+                query = query.update({"category": category, "category_source": "user"})
+            else:
+                query = query.delete()
+            res = query.eq("user_id", user_id).in_("id", ids).execute()
+
+            changed = {n["id"]: n for n in res.data or []}
+            for r in group:
+                note = changed.get(r["note_id"])
+                if note is None:
+                    r.update(ok=False, status=409, error="Note changed during batch")
+                    continue
+                r.update(ok=True, status=200)
+                if op_name != "delete":
+                    r["note"] = note
+
+            if op_name == "complete":
+                tasks_delta += len(changed)
+            elif op_name == "uncomplete":
+                tasks_delta -= len(changed)
+
+        if tasks_delta:
+            try:
+                # Applied in one statement so concurrent batches can't lose a delta
+                supabase.rpc(
+                    "adjust_tasks_completed",
+                    {
+                        "p_user_id": user_id,
+                        "p_delta": tasks_delta
+                    }
+                ).execute()
+            except Exception as stats_error:
+                print(f"Error updating stats: {stats_error}")
+
+        for r in results:
+            r.pop("note_id", None)
+            r.pop("category", None)
+
+        return jsonify({"results": results, "tasks_completed_delta": tasks_delta}), 200
+
+    except Exception as e:
+        import traceback; traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
 def is_meaningful(text: str) -> bool:
     """Filter out junk, super short, or repetitive notes."""
     if len(text.strip()) < 3:
@@ -336,7 +542,7 @@ def give_advice(note_text: str):
         return {"error": "OpenAI not configured"}
     
     try:
-        response = client.chat.completions.create(
+        response = create_chat_completion(
             model="gpt-4o-mini",
             messages=[
                 {
@@ -361,6 +567,8 @@ def give_advice(note_text: str):
             max_tokens=200
         )
         return response.choices[0].message.content
+    except CircuitOpenError:
+        raise
     except Exception as e:
         return {"error": str(e)}
 
@@ -371,7 +579,10 @@ def get_advice():
 
     if not note_text:
         return jsonify({"error": "missing note text"}), 400
-    advice = give_advice(note_text)
+    try:
+        advice = give_advice(note_text)
+    except CircuitOpenError as e:
+        return jsonify({"error": "AI temporarily unavailable"}), 503, {"Retry-After": str(int(e.retry_after))}
     return jsonify({"advice": advice})
 
 def generate_insights(note_text: str):
@@ -379,7 +590,7 @@ def generate_insights(note_text: str):
         return "OpenAI not configured"
     
     try:
-        response = client.chat.completions.create(
+        response = create_chat_completion(
             model="gpt-4o-mini",
             messages=[
                 {
@@ -398,17 +609,35 @@ def generate_insights(note_text: str):
             max_tokens=200
         )
         return response.choices[0].message.content
+    except (CircuitOpenError, APIError):
+        # Surfaced by the organize endpoints as 503/502 rather than saved into the note
+        raise
     except Exception as e:
         print(f"Error generating insights: {e}")
         return f"Error generating insights: {str(e)}"
     
-def generate_category(note_text: str) -> str:
-    """Generate a category for the note using AI"""
+def generate_category(note_text: str, embedding=None):
+    """Categorize locally from the embedding, falling back to AI when unsure.
+
+    Returns (category, source) where source is "classifier", "llm" or
+    "default"; only "llm" and "user" labels are used to train the classifier.
+    """
+    if embedding is not None:
+        category, confidence = category_classifier.predict(embedding)
+        if category and confidence >= CONFIDENCE_THRESHOLD:
+            return category, "classifier"
+    category = llm_generate_category(note_text)
+    if category is None:
+        return "Personal", "default"
+    return category, "llm"
+
+def llm_generate_category(note_text: str):
+    """Generate a category for the note using AI (None if it couldn't)"""
     if not client:
-        return "Personal"  # default fallback
+        return None
     
     try:
-        response = client.chat.completions.create(
+        response = create_chat_completion(
             model="gpt-4o-mini",
             messages=[
                 {
@@ -431,11 +660,12 @@ def generate_category(note_text: str) -> str:
         category = response.choices[0].message.content.strip()
         
         # Validate it's one of our categories
-        valid_categories = ["Health", "Work", "Personal", "Ideas", "Tasks", "Learning"]
-        return category if category in valid_categories else "Personal"
+        return category if category in CATEGORIES else None
+    except CircuitOpenError:
+        raise
     except Exception as e:
         print(f"Error generating category: {e}")
-        return "Personal"
+        return None
     
 def generate_title(note_text: str) -> str:
     """Generate a short, descriptive title for the note"""
@@ -443,7 +673,7 @@ def generate_title(note_text: str) -> str:
         return "Untitled"
     
     try:
-        response = client.chat.completions.create(
+        response = create_chat_completion(
             model="gpt-4o-mini",
             messages=[
                 {
@@ -463,6 +693,9 @@ def generate_title(note_text: str) -> str:
             max_tokens=20
         )
         return response.choices[0].message.content.strip()
+    except (CircuitOpenError, APIError):
+        # Surfaced by the organize endpoints as 503/502 rather than saved into the note
+        raise
     except Exception as e:
         print(f"Error generating title: {e}")
         return "Untitled"
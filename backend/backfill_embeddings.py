@@ -0,0 +1,199 @@
+"""Backfill or rebuild note embeddings in bulk.
+
+Streams notes in keyset-paged chunks, encodes them in large batches
+(optionally across several worker processes) and writes the vectors back
+with the update_note_embeddings RPC. Progress is checkpointed after every
+chunk so an interrupted run picks up where it stopped.
+
+    python backfill_embeddings.py --dry-run          # counts + throughput, no writes
+    python backfill_embeddings.py                    # only notes missing an embedding
+    python backfill_embeddings.py --all --processes 4
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+
+# embeddings loads backend/.env on import, so EMBEDDING_MODEL from .env applies here
+from embeddings import EMBEDDING_MODEL_NAME, get_embedding_model, to_vector_text
+
+DEFAULT_CHECKPOINT = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".backfill_checkpoint.json")
+
+
+class RateLimiter:
+    """Token bucket: `rate` notes per second with at most `burst` saved up.
+
+    Time spent encoding only refills the bucket up to `burst`, so a page's
+    writes can't all go out back to back after a slow encode.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.last = time.monotonic()
+
+    def wait(self, n: int):
+        if self.rate <= 0:
+            return
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+        self.tokens -= n
+        if self.tokens < 0:
+            time.sleep(-self.tokens / self.rate)
+            self.tokens = 0.0
+            self.last = time.monotonic()
+
+
+def load_checkpoint(path: str, mode: str) -> int:
+    """Return the last note id processed by a previous run in the same mode"""
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return 0
+    if data.get("mode") != mode or data.get("model") != EMBEDDING_MODEL_NAME:
+        print(f"Ignoring checkpoint from a different run ({data.get('mode')}, {data.get('model')})")
+        return 0
+    return int(data.get("last_id", 0))
+
+
+def save_checkpoint(path: str, mode: str, last_id: int, written: int):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"mode": mode, "model": EMBEDDING_MODEL_NAME, "last_id": last_id, "written": written}, f)
+    os.replace(tmp_path, path)
+
+
+def count_notes(supabase, missing_only: bool) -> int:
+    query = supabase.table("notes").select("id", count="exact")
+    if missing_only:
+        query = query.is_("embedding", "null")
+    return query.limit(1).execute().count or 0
+
+
+def iter_pages(supabase, after_id: int, page_size: int, missing_only: bool):
+    """Yield pages of notes ordered by id, starting after `after_id`"""
+    last_id = after_id
+    while True:
+        query = supabase.table("notes").select("id, content").gt("id", last_id)
+        if missing_only:
+            query = query.is_("embedding", "null")
+        rows = query.order("id").limit(page_size).execute().data or []
+        if not rows:
+            return
+        yield rows
+        if len(rows) < page_size:
+            return
+        last_id = rows[-1]["id"]
+
+
+def content_md5(text: str) -> str:
+    """Matches md5(coalesce(content, '')) in update_note_embeddings"""
+    return hashlib.md5(text.encode("utf-8")).hexdigest()
+
+
+def write_embeddings(supabase, ids, texts, embeddings, write_batch: int, limiter: RateLimiter, only_missing: bool) -> int:
+    """Write vectors in bulk; notes edited since they were read are skipped by the RPC"""
+    written = 0
+    for i in range(0, len(ids), write_batch):
+        chunk_ids = ids[i:i + write_batch]
+        chunk_texts = [to_vector_text(e) for e in embeddings[i:i + write_batch]]
+        limiter.wait(len(chunk_ids))
+        res = supabase.rpc(
+            "update_note_embeddings",
+            {
+                "p_note_ids": chunk_ids,
+                "p_embedding_texts": chunk_texts,
+                "p_content_md5s": [content_md5(t) for t in texts[i:i + write_batch]],
+                "p_only_missing": only_missing
+            }
+        ).execute()
+        written += res.data if isinstance(res.data, int) else 0
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill or re-index note embeddings")
+    parser.add_argument("--all", action="store_true", help="Re-encode every note, not just ones missing an embedding")
+    parser.add_argument("--dry-run", action="store_true", help="Encode without writing and report throughput")
+    parser.add_argument("--limit", type=int, default=0, help="Stop after this many notes (0 = no limit)")
+    parser.add_argument("--page-size", type=int, default=2000, help="Notes fetched per keyset page")
+    parser.add_argument("--encode-batch", type=int, default=256, help="Batch size passed to the encoder")
+    parser.add_argument("--write-batch", type=int, default=200, help="Notes per bulk update RPC")
+    parser.add_argument("--processes", type=int, default=1, help="Encoder worker processes (CPU)")
+    parser.add_argument("--rate", type=float, default=500, help="Max notes written per second (0 = unlimited)")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT)
+    parser.add_argument("--restart", action="store_true", help="Ignore any existing checkpoint")
+    args = parser.parse_args()
+
+    # Imported here so --help works without credentials
+    from app import supabase
+
+    missing_only = not args.all
+    mode = "missing" if missing_only else "all"
+
+    total = count_notes(supabase, missing_only=False)
+    missing = count_notes(supabase, missing_only=True)
+    print(f"Notes: {total}, missing embeddings: {missing}, model: {EMBEDDING_MODEL_NAME}")
+
+    after_id = 0 if args.restart or args.dry_run else load_checkpoint(args.checkpoint, mode)
+    if after_id:
+        print(f"Resuming after note {after_id}")
+
+    model = get_embedding_model()
+    pool = model.start_multi_process_pool(["cpu"] * args.processes) if args.processes > 1 else None
+    limiter = RateLimiter(args.rate, burst=args.write_batch)
+
+    processed = written = 0
+    finished = True
+    encode_seconds = 0.0
+    started = time.monotonic()
+    try:
+        for rows in iter_pages(supabase, after_id, args.page_size, missing_only):
+            if args.limit:
+                rows = rows[:args.limit - processed]
+            ids = [row["id"] for row in rows]
+            texts = [row.get("content") or "" for row in rows]
+
+            encode_start = time.monotonic()
+            if pool:
+                embeddings = model.encode_multi_process(texts, pool, batch_size=args.encode_batch)
+            else:
+                embeddings = model.encode(texts, batch_size=args.encode_batch)
+            encode_seconds += time.monotonic() - encode_start
+
+            if not args.dry_run:
+                written += write_embeddings(supabase, ids, texts, embeddings, args.write_batch, limiter, missing_only)
+                save_checkpoint(args.checkpoint, mode, ids[-1], written)
+
+            processed += len(rows)
+            elapsed = time.monotonic() - started
+            print(f"  {processed} notes, last id {ids[-1]}, {processed / elapsed:.1f} notes/s overall")
+
+            if args.limit and processed >= args.limit:
+                finished = False
+                break
+    finally:
+        if pool:
+            model.stop_multi_process_pool(pool)
+
+    elapsed = time.monotonic() - started
+    print(f"Processed {processed} notes in {elapsed:.1f}s")
+    if processed:
+        print(f"Encoding: {processed / max(encode_seconds, 1e-9):.1f} notes/s, overall: {processed / max(elapsed, 1e-9):.1f} notes/s")
+    if args.dry_run:
+        print("Dry run - nothing written")
+    else:
+        print(f"Wrote {written} embeddings")
+        if processed > written:
+            print(f"Skipped {processed - written} notes edited (or already embedded) since they were read")
+        # A complete pass needs no resume point; the next run should rescan from the start
+        if finished and os.path.exists(args.checkpoint):
+            os.remove(args.checkpoint)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+"""Local nearest-centroid category classifier over note embeddings.
+
+Train from already-categorized notes and compare against the LLM:
+
+    python classifier.py train
+    python classifier.py eval --limit 200
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+from dotenv import load_dotenv
+
+from admission import _env_float
+from embeddings import EMBEDDING_MODEL_NAME, get_embedding_model, parse_vector
+
+# Read backend/.env before the settings below are evaluated at import time
+load_dotenv()
+
+CATEGORIES = ["Health", "Work", "Personal", "Ideas", "Tasks", "Learning"]
+
+CLASSIFIER_PATH = os.getenv(
+    "CATEGORY_CLASSIFIER_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "category_centroids.json"),
+)
+CONFIDENCE_THRESHOLD = _env_float("CATEGORY_CONFIDENCE_THRESHOLD", 0.6)
+# Softmax temperature over cosine similarities; MiniLM similarities sit in a narrow band
+DEFAULT_TEMPERATURE = 0.05
+MIN_NOTES_PER_CATEGORY = 5
+PAGE_SIZE = 1000
+# Notes with id % HOLDOUT_MOD == 0 are kept out of training so eval is honest
+DEFAULT_HOLDOUT_MOD = 5
+# Labels set by a person or by the LLM. "classifier" labels would train the
+# model on its own output and "default" is the "Personal" fallback.
+TRUSTED_SOURCES = ("user", "llm")
+# Insights text written by failed organize runs before category_source existed
+FAILED_INSIGHTS_PREFIXES = ("Error generating insights", "OpenAI not configured")
+
+
+def _normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class CentroidClassifier:
+    """Nearest-centroid classifier whose centroids live in a JSON file.
+
+    The file is re-read whenever its mtime changes, so retraining takes
+    effect without restarting the server.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        # (categories, centroids, temperature), swapped in as one object so
+        # predict never sees categories and centroids from different files
+        self.model = None
+        self.holdout_mod = 0
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    def _maybe_reload(self):
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            self.model = None
+            self._mtime = None
+            return
+        if mtime == self._mtime:
+            return
+        with self._lock:
+            if mtime == self._mtime:
+                return
+            model = None
+            try:
+                with open(self.path) as f:
+                    data = json.load(f)
+                if data.get("model") != EMBEDDING_MODEL_NAME:
+                    print(f"Category classifier trained on {data.get('model')}, expected {EMBEDDING_MODEL_NAME}; ignoring")
+                else:
+                    model = (
+                        list(data["categories"]),
+                        _normalize(np.asarray(data["centroids"], dtype=np.float32)),
+                        float(data.get("temperature", DEFAULT_TEMPERATURE)),
+                    )
+                    self.holdout_mod = int(data.get("holdout_mod", 0))
+            except Exception as e:
+                print(f"Error loading category classifier: {e}")
+            self.model = model
+            self._mtime = mtime
+
+    def predict(self, embedding):
+        """Return (category, confidence), or (None, 0.0) if no model is loaded"""
+        self._maybe_reload()
+        model = self.model
+        if model is None or embedding is None:
+            return None, 0.0
+        categories, centroids, temperature = model
+        vector = _normalize(np.asarray(embedding, dtype=np.float32))
+        scores = centroids @ vector / temperature
+        scores -= scores.max()
+        probs = np.exp(scores)
+        probs /= probs.sum()
+        best = int(np.argmax(probs))
+        return categories[best], float(probs[best])
+
+
+category_classifier = CentroidClassifier(CLASSIFIER_PATH)
+
+
+def is_trusted_label(row) -> bool:
+    """Notes saved before category_source existed count only if they were organized"""
+    if row.get("category_source") is not None:
+        return row["category_source"] in TRUSTED_SOURCES
+    insights = row.get("insights")
+    return bool(insights) and not insights.startswith(FAILED_INSIGHTS_PREFIXES)
+
+
+def iter_categorized_notes(supabase, limit=None, keep=None):
+    """Yield notes with a trusted, valid category, keyset-paged by id"""
+    last_id = 0
+    seen = 0
+    sources = ",".join(TRUSTED_SOURCES)
+    while True:
+        res = supabase.table("notes")\
+            .select("id, content, category, category_source, insights, embedding")\
+            .gt("id", last_id)\
+            .in_("category", CATEGORIES)\
+            .or_(f"category_source.in.({sources}),and(category_source.is.null,insights.not.is.null)")\
+            .order("id")\
+            .limit(PAGE_SIZE)\
+            .execute()
+        rows = res.data or []
+        for row in rows:
+            if not (row.get("content") or "").strip() or not is_trusted_label(row):
+                continue
+            if keep and not keep(row):
+                continue
+            yield row
+            seen += 1
+            if limit and seen >= limit:
+                return
+        if len(rows) < PAGE_SIZE:
+            return
+        last_id = rows[-1]["id"]
+
+
+def note_embedding(row):
+    """Use the stored embedding when present, otherwise encode the content"""
+    embedding = parse_vector(row.get("embedding"))
+    if embedding is None:
+        embedding = get_embedding_model().encode(row["content"])
+    return embedding
+
+
+def train(supabase, path=CLASSIFIER_PATH, temperature=DEFAULT_TEMPERATURE, holdout_mod=DEFAULT_HOLDOUT_MOD):
+    sums = {}
+    counts = {}
+    keep = (lambda row: row["id"] % holdout_mod != 0) if holdout_mod else None
+    for row in iter_categorized_notes(supabase, keep=keep):
+        embedding = _normalize(np.asarray(note_embedding(row), dtype=np.float32))
+        category = row["category"]
+        sums[category] = sums.get(category, 0) + embedding
+        counts[category] = counts.get(category, 0) + 1
+
+    categories = [c for c in CATEGORIES if counts.get(c, 0) >= MIN_NOTES_PER_CATEGORY]
+    if len(categories) < 2:
+        raise SystemExit(f"Not enough categorized notes to train (counts: {counts})")
+
+    data = {
+        "model": EMBEDDING_MODEL_NAME,
+        "categories": categories,
+        "centroids": [(sums[c] / counts[c]).tolist() for c in categories],
+        "temperature": temperature,
+        "holdout_mod": holdout_mod,
+        "counts": counts,
+        "trained_at": datetime.now().isoformat(),
+    }
+    # Write then rename so a running server never reads a half-written file
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+    print(f"Trained on {sum(counts.values())} notes: {counts}")
+    if holdout_mod:
+        print(f"Held out notes with id % {holdout_mod} == 0 for eval")
+    print(f"Saved to {path}")
+
+
+def evaluate(supabase, llm_categorize, limit=200, threshold=CONFIDENCE_THRESHOLD):
+    classifier = CentroidClassifier(CLASSIFIER_PATH)
+    classifier.predict(None)  # load the file up front
+    if classifier.model is None:
+        raise SystemExit(f"No usable classifier at {CLASSIFIER_PATH}; run `python classifier.py train` first")
+    holdout_mod = classifier.holdout_mod
+    if not holdout_mod:
+        print("Warning: classifier was trained without a holdout; agreement will be inflated")
+    keep = (lambda row: row["id"] % holdout_mod == 0) if holdout_mod else None
+
+    total = agree = confident = confident_agree = encoded = 0
+    local_seconds = encode_seconds = llm_seconds = 0.0
+
+    for row in iter_categorized_notes(supabase, limit=limit, keep=keep):
+        embedding = parse_vector(row.get("embedding"))
+        if embedding is None:
+            # Timed separately: the server always has the embedding already
+            start = time.perf_counter()
+            embedding = get_embedding_model().encode(row["content"])
+            encode_seconds += time.perf_counter() - start
+            encoded += 1
+
+        start = time.perf_counter()
+        category, confidence = classifier.predict(embedding)
+        local_seconds += time.perf_counter() - start
+
+        start = time.perf_counter()
+        llm_category = llm_categorize(row["content"])
+        llm_seconds += time.perf_counter() - start
+
+        total += 1
+        agree += category == llm_category
+        if confidence >= threshold:
+            confident += 1
+            confident_agree += category == llm_category
+
+    if not total:
+        print("No categorized notes to evaluate")
+        return
+
+    print(f"Held-out notes evaluated: {total}")
+    print(f"Agreement with LLM:       {agree / total:.1%}")
+    print(f"Above threshold {threshold:.2f}:    {confident / total:.1%} of notes")
+    if confident:
+        print(f"Agreement above thresh:   {confident_agree / confident:.1%}")
+    print(f"Local time per note:      {local_seconds / total * 1000:.3f} ms (predict only)")
+    if encoded:
+        print(f"Encoding time per note:   {encode_seconds / encoded * 1000:.2f} ms ({encoded} notes had no stored embedding)")
+    print(f"LLM time per note:        {llm_seconds / total * 1000:.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train or evaluate the local category classifier")
+    sub = parser.add_subparsers(dest="command", required=True)
+    train_parser = sub.add_parser("train", help="Build centroids from categorized notes")
+    train_parser.add_argument("--temperature", type=float, default=DEFAULT_TEMPERATURE)
+    train_parser.add_argument("--holdout", type=int, default=DEFAULT_HOLDOUT_MOD,
+                              help="Hold out notes with id %% N == 0 for eval (0 = train on everything)")
+    eval_parser = sub.add_parser("eval", help="Compare the classifier against the LLM")
+    eval_parser.add_argument("--limit", type=int, default=200)
+    eval_parser.add_argument("--threshold", type=float, default=CONFIDENCE_THRESHOLD)
+    args = parser.parse_args()
+
+    # Imported here so the server can import this module without a cycle
+    from app import supabase, client, llm_generate_category
+
+    if args.command == "train":
+        train(supabase, temperature=args.temperature, holdout_mod=args.holdout)
+    else:
+        if not client:
+            raise SystemExit("OpenAI not configured - set OPENAI_API_KEY to compare against the LLM")
+        evaluate(supabase, llm_generate_category, limit=args.limit, threshold=args.threshold)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+import json
+import os
+import threading
+
+import numpy as np
+from dotenv import load_dotenv
+from sentence_transformers import SentenceTransformer
+
+# Read backend/.env before EMBEDDING_MODEL is evaluated at import time
+load_dotenv()
+
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+
+_model = None
+_model_lock = threading.Lock()
+
+
+def get_embedding_model() -> SentenceTransformer:
+    """Load the sentence transformer once and reuse it across requests"""
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                _model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+    return _model
+
+
+def to_vector_text(embedding) -> str:
+    """Format an embedding the way update_note_embedding expects it"""
+    return "[" + ",".join(map(str, embedding)) + "]"
+
+
+def parse_vector(value):
+    """Parse a pgvector column as returned by PostgREST (a "[...]" string)"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = json.loads(value)
+    return np.asarray(value, dtype=np.float32)
@@ -28,6 +28,8 @@ export default function AddNote() {
   const [title, setTitle] = useState("");
   const [content, setContent] = useState("");
   const [category, setCategory] = useState("Health");
+  // Only a category chosen in the picker counts as the user's label
+  const [categoryPicked, setCategoryPicked] = useState(false);
   const [showCategoryPicker, setShowCategoryPicker] = useState(false);
   const [savingMode, setSavingMode] = useState<'none' | 'save' | 'organize'>('none');
 
@@ -44,7 +46,7 @@ export default function AddNote() {
     try {
       setSavingMode('save');
       dismissKeyboard();
-      await addNote(title.trim() || "Untitled", content.trim(), category, false);
+      await addNote(title.trim() || "Untitled", content.trim(), category, false, categoryPicked);
       router.back();
     } catch (e: any) {
       Alert.alert("Error", e.message || "Failed to save note");
@@ -191,6 +193,7 @@ export default function AddNote() {
                         ]}
                         onPress={() => {
                           setCategory(item);
+                          setCategoryPicked(true);
                           setShowCategoryPicker(false);
                         }}
                       >
@@ -32,6 +32,8 @@ export default function EditNote() {
   const [title, setTitle] = useState("");
   const [content, setContent] = useState("");
   const [category, setCategory] = useState("Health");
+  // Only a category chosen in the picker counts as the user's label
+  const [categoryPicked, setCategoryPicked] = useState(false);
   const [showCategoryPicker, setShowCategoryPicker] = useState(false);
   const [savingMode, setSavingMode] = useState<'none' | 'save' | 'organize'>('none');
   const [loading, setLoadingNote] = useState(isEditing);
@@ -78,12 +80,13 @@ export default function EditNote() {
           organize: false
         });
       } else {
-        await addNote(title.trim() || "Untitled", content.trim(), category, false);
+        await addNote(title.trim() || "Untitled", content.trim(), category, false, categoryPicked);
       }
       
       setTitle("");
       setContent("");
       setCategory("Health");
+      setCategoryPicked(false);
       router.replace('/notes');
     } catch (e: any) {
       console.error("Failed to save note", e);
@@ -114,6 +117,7 @@ export default function EditNote() {
       setTitle("");
       setContent("");
       setCategory("Health");
+      setCategoryPicked(false);
       router.replace('/notes');
     } catch (e: any) {
       console.error("Failed to organize note", e);
@@ -242,6 +246,7 @@ export default function EditNote() {
                         ]}
                         onPress={() => {
                           setCategory(item);
+                          setCategoryPicked(true);
                           setShowCategoryPicker(false);
                         }}
                       >
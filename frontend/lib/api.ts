@@ -52,7 +52,8 @@ export async function addNote(
   title: string, 
   content: string, 
   category?: string,
-  organize?: boolean
+  organize?: boolean,
+  categoryPicked?: boolean
 ) {
   // Get current user for activity tracking
   const { data: { user } } = await supabase.auth.getUser();
@@ -63,7 +64,7 @@ export async function addNote(
   const res = await fetch(`${API}/notes`, {
     method: "POST",
     headers: { "Content-Type": "application/json" },
-    body: JSON.stringify({ title, content, category, organize, user_id }),
+    body: JSON.stringify({ title, content, category, organize, user_id, category_picked: !!categoryPicked }),
   });
   if (!res.ok) throw new Error("Failed to create note");
   return res.json();
@@ -288,4 +289,25 @@ export async function uncompleteTask(id: string) {
   });
   if (!res.ok) throw new Error("Failed to uncomplete task");
   return res.json();
-}
\ No newline at end of file
+}
+
+// Apply many task/note changes in one request (calls POST /notes/batch)
+export type BatchOperation =
+  | { op: "complete" | "uncomplete" | "delete"; id: string | number }
+  | { op: "set_category"; id: string | number; category: string };
+
+export async function batchUpdateNotes(operations: BatchOperation[]) {
+  const { data: { user } } = await supabase.auth.getUser();
+
+  if (!user?.id) {
+    throw new Error("Not authenticated");
+  }
+
+  const res = await fetch(`${API}/notes/batch`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ user_id: user.id, operations }),
+  });
+  if (!res.ok) throw new Error("Failed to apply batch");
+  return res.json();
+}
@@ -0,0 +1,31 @@
+-- Bulk counterpart of update_note_embedding, used by backend/backfill_embeddings.py.
+-- A row is only written if its content still hashes to what the backfill read
+-- (and, with p_only_missing, if it still has no embedding), so a note saved
+-- while the backfill was encoding keeps the fresh embedding update_note wrote.
+drop function if exists public.update_note_embeddings(bigint[], text[]);
+
+CREATE OR REPLACE FUNCTION public.update_note_embeddings(
+  p_note_ids bigint[],
+  p_embedding_texts text[],
+  p_content_md5s text[],
+  p_only_missing boolean default false
+)
+ RETURNS integer
+ LANGUAGE sql
+ SECURITY DEFINER
+ SET search_path TO 'public', 'extensions'
+AS $function$
+  with updated as (
+    update public.notes n
+    set embedding = v.embedding_text::vector
+    from unnest(p_note_ids, p_embedding_texts, p_content_md5s) as v(note_id, embedding_text, content_md5)
+    where n.id = v.note_id
+      and md5(coalesce(n.content, '')) = v.content_md5
+      and (not p_only_missing or n.embedding is null)
+    returning 1
+  )
+  select count(*)::integer from updated;
+$function$
+;
+
+revoke execute on function public.update_note_embeddings(bigint[], text[], text[], boolean) from public, anon, authenticated;
@@ -0,0 +1,3 @@
+-- Where a note's category came from: 'user', 'llm', 'classifier' or 'default'.
+-- backend/classifier.py only trains on 'user' and 'llm' labels.
+alter table "public"."notes" add column if not exists "category_source" text;
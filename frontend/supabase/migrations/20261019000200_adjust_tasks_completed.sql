@@ -0,0 +1,28 @@
+-- Atomically add a (possibly negative) delta to user_stats.tasks_completed,
+-- used by POST /notes/batch. Creates the stats row on first completion.
+CREATE OR REPLACE FUNCTION public.adjust_tasks_completed(p_user_id uuid, p_delta integer)
+ RETURNS integer
+ LANGUAGE plpgsql
+ SECURITY DEFINER
+ SET search_path TO 'public'
+AS $function$
+declare
+  v_count integer;
+begin
+  update public.user_stats
+  set tasks_completed = greatest(0, coalesce(tasks_completed, 0) + p_delta)
+  where user_id = p_user_id
+  returning tasks_completed into v_count;
+
+  if not found then
+    v_count := greatest(0, p_delta);
+    insert into public.user_stats (user_id, tasks_completed, current_streak, longest_streak, total_dumps)
+    values (p_user_id, v_count, 0, 0, 0);
+  end if;
+
+  return v_count;
+end;
+$function$
+;
+
+revoke execute on function public.adjust_tasks_completed(uuid, integer) from public, anon, authenticated;